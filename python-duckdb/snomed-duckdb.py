@@ -6,8 +6,9 @@ import sys
 import tempfile
 import zipfile
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
-from typing import List, Tuple, Callable
+from typing import Dict, List, Tuple
 
 # Constants for DuckDB
 IN_MEMORY_KEYWORD = ":memory:"
@@ -15,20 +16,33 @@ UI_PORT = 4213
 UI_INSTALL_COMMAND = "INSTALL ui;"
 UI_LOAD_COMMAND = "LOAD ui;"
 UI_START_COMMAND = "CALL start_ui();"
-COPY_OPTIONS = "HEADER, DELIMITER '\t', DATEFORMAT '%Y%m%d', NULL '\n'"
+READ_CSV_OPTIONS = "header = true, delim = '\t', dateformat = '%Y%m%d', nullstr = '\n'"
+CHECKPOINT_COMMAND = "CHECKPOINT;"
+FIND_RELEASE_FILES_QUERY = (
+    "SELECT file FROM glob(?) WHERE regexp_matches(parse_filename(file), ?)"
+)
+CHECKPOINT_THRESHOLD_SETTING = "PRAGMA checkpoint_threshold = '16GB';"
+MAX_IMPORT_WORKERS = min(8, os.cpu_count() or 1)
+CONCEPT_TABLE_PREFIX = "concept"
 
 # Constants for logging messages
 DEBUG_CONNECTION_CLOSED = "Connection closed"
-DEBUG_FAILED_SQL = "SQL failed: COPY {} FROM '{}' ({})"
+DEBUG_FAILED_SQL = "SQL failed: INSERT INTO {} SELECT * FROM read_csv({}, {})"
+DEBUG_IMPORTED_FILE = "Imported '{}'"
 DEBUG_UI_EXT_LOADED = "UI extension loaded"
+ERROR_BULK_CONFIG_FAILED = "Bulk load configuration failed: {}"
+ERROR_CHECKPOINT_FAILED = "Checkpoint failed: {}"
 ERROR_IMPORT_FAILURE = "Failed to import '{}': {}"
+ERROR_IMPORT_TABLE_MISSING = "Failed to import '{}', table missing (was the DDL executed?): {}"
 ERROR_INVALID_PACKAGE = "Invalid package directory"
 ERROR_SQL_EXEC_FAILED = "SQL execution failed: {}, {}"
 ERROR_UI_INIT_FAILED = "UI initialization failed: {}"
 ERROR_UI_START_FAILED = "UI start failed: {}"
+ERROR_RELEASE_INCOMPLETE = "Import of {} files incomplete due to errors"
 ERROR_ZIP_NOT_FOUND = "Zip file not found"
+ERROR_ZIP_NO_RF2_FILES = "No RF2 release files found in zip package"
 INFO_EXTRACTING_PACKAGE = "Extracting package '{}'"
-INFO_IMPORT_SUCCESS = "Imported '{}'"
+INFO_IMPORT_SUCCESS = "Imported {} file(s) into '{}'"
 INFO_SQL_EXEC_SUCCESS = "Executed SQL: '{}'"
 INFO_UI_RUNNING = "UI running at http://localhost:{}"
 WARNING_NO_MATCHING_FILES = "No matching files for release type {}"
@@ -74,7 +88,7 @@ class ReleaseType(Enum):
         self.short_code = full_name[0].lower()
 
 
-def get_table_details(release_dir, release_type: ReleaseType):
+def build_filter_regex(release_type_pattern):
     # define the regex filter to match release file naming convention per RF2 specification:
     # https://confluence.ihtsdotools.org/display/DOCRELFMT/3.3.2+Release+File+Naming+Convention
     #
@@ -85,7 +99,7 @@ def get_table_details(release_dir, release_type: ReleaseType):
 
     refset_id = r"(?:\d{6,18})?"
     summary = r"(\w+)?"  # match group 3
-    rt = rf"{release_type.value}"
+    rt = rf"(?:{release_type_pattern})"
     language_code = r"(-[a-z-]{2,8})?"
     content_sub_type = rf"{refset_id}{summary}{rt}{language_code}"
 
@@ -93,70 +107,124 @@ def get_table_details(release_dir, release_type: ReleaseType):
     version_date = r"\d{8}"
     file_ext = r"txt"
 
-    filter_regex = rf"^{file_type}_{content_type}_{content_sub_type}_{country_namespace}_{version_date}\.{file_ext}$"
+    return rf"^{file_type}_{content_type}_{content_sub_type}_{country_namespace}_{version_date}\.{file_ext}$"
+
+
+def content_table_name(match, short_code):
+    return f"{match.group(2)}_{short_code}"  # i.e. Concept_f for terminology data files
+
+
+def summary_table_name(match, short_code):
+    return f"{match.group(3)}refset_{short_code}"  # Languagerefset_f for derivative work data files
+
 
+# table naming strategy keyed on (file type, summary is OWLExpression); only
+# non-OWL terminology data files take their name from the content type
+EXTRACT_STRATEGIES = {
+    ("sct", False): content_table_name,
+    ("sct", True): summary_table_name,
+    ("der", False): summary_table_name,
+    ("der", True): summary_table_name,
+}
+
+
+def extract_content_or_summary(match, release_type: ReleaseType):
     # align with table names used in the RVF:
     # https://github.com/IHTSDO/release-validation-framework/blob/master/src/main/resources/sql/create-tables-mysql.sql
-
-    extract_content_or_summary = (
-        filter_regex,  # only import files that match the naming convention above (e.g. exclude *.json)
-        lambda match: (
-            match.group(2)
-            + "_"
-            + release_type.short_code  # i.e. Concept_f for terminology data files
-            if (match.group(1) == "sct" and match.group(3) != "OWLExpression")
-            else match.group(3)
-            + "refset_"
-            + release_type.short_code  # Languagerefset_f for derivative work data files
-        ),
-    )
-
-    drop_suffix_from_refsetdescriptor = (
-        rf"RefsetDescriptorrefset_{release_type.short_code}",
-        rf"RefsetDescriptor_{release_type.short_code}",
-    )
-
-    drop_suffix_from_simplerefset = (r"(Simple)(Refset)", r"\1")
-    drop_suffix_from_associationreference = (r"(Association)(Reference)", r"\1")
-    shorten_language_prefix = (r"(Language)", "Lang")
-    add_underscore_to_relationship_concrete_values = (
-        r"(Relationship)(Concrete)(Values)",
-        r"\1_\2_\3",
-    )
-    add_underscore_to_stated_relationship = (r"(Stated)(Relationship)", r"\1_\2")
-
-    regex_transformations: List[Tuple[str, str | Callable]] = [
-        extract_content_or_summary,
-        drop_suffix_from_refsetdescriptor,
-        drop_suffix_from_simplerefset,
-        drop_suffix_from_associationreference,
-        shorten_language_prefix,
-        add_underscore_to_relationship_concrete_values,
-        add_underscore_to_stated_relationship,
+    strategy = EXTRACT_STRATEGIES[
+        (match.group(1), match.group(3) == "OWLExpression")
     ]
+    return strategy(match, release_type.short_code)
+
+
+# single-pass table name normalization: one alternation per legacy rename,
+# dispatched through NORMALIZE_REPLACEMENTS on the matched group name
+NORMALIZE_REGEX = re.compile(
+    r"(?P<refsetdescriptor>RefsetDescriptorrefset)"
+    r"|(?P<simplerefset>SimpleRefset)"
+    r"|(?P<associationreference>AssociationReference)"
+    r"|(?P<language>Language)"
+    r"|(?P<relationshipconcretevalues>RelationshipConcreteValues)"
+    r"|(?P<statedrelationship>StatedRelationship)"
+)
+NORMALIZE_REPLACEMENTS = {
+    "refsetdescriptor": "RefsetDescriptor",  # drop refset suffix
+    "simplerefset": "Simple",  # drop Refset suffix
+    "associationreference": "Association",  # drop Reference suffix
+    "language": "Lang",  # shorten prefix
+    "relationshipconcretevalues": "Relationship_Concrete_Values",  # add underscores
+    "statedrelationship": "Stated_Relationship",  # add underscore
+}
+
+
+def normalize_table_name(match):
+    return NORMALIZE_REPLACEMENTS[match.lastgroup]
+
+
+# pre-compile the per-release-type patterns once at module load so the
+# per-file loop works on compiled Pattern objects
+FILTER_REGEXES = {rt: re.compile(build_filter_regex(rt.value)) for rt in ReleaseType}
+RF2_FILENAME_REGEX = re.compile(
+    build_filter_regex("|".join(rt.value for rt in ReleaseType))
+)
+
+
+def get_table_details(client, release_dir, release_type: ReleaseType):
+    release_subdir = os.path.join(release_dir, release_type.value)
+    # release types the package does not ship are skipped outright,
+    # without walking the tree
+    if not os.path.isdir(release_subdir):
+        return {}
+
+    filter_regex = FILTER_REGEXES[release_type]
 
     normalized_table_names = []
-    for dirname, _, files in os.walk(os.path.join(release_dir, release_type.value)):
-        for filename in files:
-            if re.match(filter_regex, filename):
-                normalized_filename = filename
-                for pattern, replacement in regex_transformations:
-                    normalized_filename = re.sub(
-                        pattern, replacement, normalized_filename
-                    )
-                normalized_table_names.append(
-                    (normalized_filename.lower(), dirname, filename)
+    # discovery runs inside DuckDB: glob traverses the subtree and RE2
+    # filters out non-RF2 files (docs, JSON, etc.) before Python sees them;
+    # the Python match on the survivors only recovers the capture groups
+    for rf2_filepath in client.find_release_files(release_subdir, filter_regex):
+        dirname, filename = os.path.split(rf2_filepath)
+        match = filter_regex.match(filename)
+        if match:
+            table_name = NORMALIZE_REGEX.sub(
+                normalize_table_name,
+                extract_content_or_summary(match, release_type),
+            ).lower()
+            # precompute the sort rank so sorting compares plain tuples
+            # instead of re-running substring scans on every comparison
+            normalized_table_names.append(
+                (
+                    "sct2" not in dirname,  # Prioritize terminology data files
+                    "concept" not in table_name,  # Prioritize concept files
+                    table_name,  # Finally, sort alphabetically by normalized name
+                    dirname,
+                    filename,
                 )
+            )
 
     # sort filenames to ensure that terminology data and concept files are loaded first
-    normalized_table_names.sort(
-        key=lambda x: (
-            "sct2" not in x[1],  # Prioritize terminology data files
-            "concept" not in x[0],  # Prioritize concept files
-            x[0],  # Finally, sort alphabetically by normalized name
-        )
-    )
-    return normalized_table_names
+    normalized_table_names.sort()
+
+    # group files by target table so each table can be loaded in a single COPY
+    table_details: Dict[str, List[Tuple[str, str]]] = {}
+    for _, _, table_name, dirname, filename in normalized_table_names:
+        table_details.setdefault(table_name, []).append((dirname, filename))
+    return table_details
+
+
+def load_sql_resources():
+    # the DDL and validation SQL are static assets, so read them once at
+    # startup instead of re-opening the files on every execution; the cache
+    # is also safe to share across the import worker threads
+    sql_resources = {}
+    for sql_filename in os.listdir(SQL_RESOURCES_PATH):
+        if sql_filename.endswith(".sql"):
+            with open(os.path.join(SQL_RESOURCES_PATH, sql_filename), "r") as file:
+                sql_resources[sql_filename] = file.read()
+    return sql_resources
+
+
+SQL_RESOURCES = load_sql_resources()
 
 
 def validate_package_path(package_path):
@@ -168,6 +236,7 @@ def validate_package_path(package_path):
 
 class DuckDBClient:
     def __init__(self, db_path=IN_MEMORY_KEYWORD):
+        self.is_persistent = bool(db_path) and db_path != IN_MEMORY_KEYWORD
         self.conn = duckdb.connect(db_path)
         try:
             self.conn.execute(UI_INSTALL_COMMAND)
@@ -176,19 +245,64 @@ class DuckDBClient:
         except Exception as e:
             logging.error(ERROR_UI_INIT_FAILED.format(e))
 
-    def execute_sql_file(self, dirname, sql_filename):
-        sql_filepath = os.path.join(dirname, sql_filename)
+    def configure_for_bulk_load(self):
+        # engage every core for the CSV scans and drop the insertion-order
+        # guarantee, which RF2 rows do not rely on; spill files go to the
+        # system temp directory instead of the working directory
+        settings = [
+            f"SET threads = {os.cpu_count() or 1};",
+            "SET preserve_insertion_order = false;",
+            f"SET temp_directory = '{os.path.join(tempfile.gettempdir(), 'duckdb_bulk_load')}';",
+        ]
+        if not sys.stdout.isatty():
+            settings.append("PRAGMA disable_progress_bar;")
+        if self.is_persistent:
+            # defer WAL checkpoints during the load; one explicit CHECKPOINT
+            # afterwards turns many small flushes into a single big one
+            settings.append(CHECKPOINT_THRESHOLD_SETTING)
+        try:
+            for setting in settings:
+                self.conn.execute(setting)
+        except Exception as e:
+            logging.error(ERROR_BULK_CONFIG_FAILED.format(e))
+
+    def find_release_files(self, release_subdir, filter_regex):
+        result = self.conn.execute(
+            FIND_RELEASE_FILES_QUERY,
+            [os.path.join(release_subdir, "**", "*.txt"), filter_regex.pattern],
+        ).fetchall()
+        return [rf2_filepath for (rf2_filepath,) in result]
+
+    def checkpoint(self):
+        if self.is_persistent:
+            try:
+                self.conn.execute(CHECKPOINT_COMMAND)
+            except Exception as e:
+                logging.error(ERROR_CHECKPOINT_FAILED.format(e))
+
+    def execute_sql_file(self, sql_filename):
+        try:
+            output = self.conn.execute(SQL_RESOURCES[sql_filename])
+            logging.info(INFO_SQL_EXEC_SUCCESS.format(sql_filename))
+            return output.fetchall()
+        except Exception as e:
+            logging.error(ERROR_SQL_EXEC_FAILED.format(sql_filename, e))
+
+    def execute_sql_file_scalar(self, sql_filename):
+        # wrap the query in a count so a single integer crosses back into
+        # Python instead of a materialized result set
         try:
-            with open(sql_filepath, "r") as file:
-                output = self.conn.execute(file.read())
-                logging.info(INFO_SQL_EXEC_SUCCESS.format(sql_filename))
-                return output.fetchall()
+            query = SQL_RESOURCES[sql_filename].rstrip().rstrip(";")
+            output = self.conn.execute(f"SELECT COUNT(*) FROM ({query});")
+            logging.info(INFO_SQL_EXEC_SUCCESS.format(sql_filename))
+            return output.fetchone()[0]
         except Exception as e:
-            logging.error(ERROR_SQL_EXEC_FAILED.format(sql_filepath, e))
+            logging.error(ERROR_SQL_EXEC_FAILED.format(sql_filename, e))
+            return None
 
     def execute_ddl(self, release_type: ReleaseType):
         ddl_filename = f"create_{release_type.value.lower()}_tables.sql"
-        self.execute_sql_file(SQL_RESOURCES_PATH, ddl_filename)
+        self.execute_sql_file(ddl_filename)
 
     def start_ui(self):
         try:
@@ -196,18 +310,103 @@ class DuckDBClient:
         except Exception as e:
             logging.error(ERROR_UI_START_FAILED.format(e))
 
-    def import_text_file(self, table_name, dirname, rf2_filename):
-        rf2_filepath = os.path.join(dirname, rf2_filename)
+    def import_tables(self, table_details):
+        # the concept tables load first because every other table holds
+        # foreign keys into them; afterwards the remaining tables fan out
+        # across worker threads, each on its own cursor
+        concept_tables = [
+            item
+            for item in table_details.items()
+            if item[0].startswith(CONCEPT_TABLE_PREFIX)
+        ]
+        dependent_tables = [
+            item
+            for item in table_details.items()
+            if not item[0].startswith(CONCEPT_TABLE_PREFIX)
+        ]
+        with ThreadPoolExecutor(max_workers=MAX_IMPORT_WORKERS) as executor:
+            concept_results = list(
+                executor.map(self._import_text_files_on_cursor, concept_tables)
+            )
+            # a failed concept load only dooms its own release type, whose
+            # tables share the concept table's _f/_s suffix; the other
+            # release type still loads in full
+            failed_suffixes = {
+                table_name.rsplit("_", 1)[-1]
+                for (table_name, _), imported in zip(concept_tables, concept_results)
+                if not imported
+            }
+            # dependent tables load best-effort: an unrecognized refset type
+            # (one the DDL does not cover yet) only costs its own table
+            dependent_results = list(
+                executor.map(
+                    self._import_text_files_on_cursor,
+                    [
+                        item
+                        for item in dependent_tables
+                        if item[0].rsplit("_", 1)[-1] not in failed_suffixes
+                    ],
+                )
+            )
+        return sum(concept_results) + sum(dependent_results)
+
+    def _import_text_files_on_cursor(self, table_item):
+        table_name, file_details = table_item
+        cursor = self.conn.cursor()
+        try:
+            return self.import_text_files(table_name, file_details, cursor)
+        finally:
+            cursor.close()
+
+    def table_column_spec(self, table_name, connection=None):
+        # spell the table's columns out for read_csv so the sniffer never
+        # runs; for the many small refset files its startup cost dominates
+        # the actual bytes read
+        table_info = (
+            (connection or self.conn)
+            .execute(f"PRAGMA table_info('{table_name}')")
+            .fetchall()
+        )
+        return (
+            "{"
+            + ", ".join(
+                f"'{column_name}': '{column_type}'"
+                for _, column_name, column_type, *_ in table_info
+            )
+            + "}"
+        )
+
+    def import_text_files(self, table_name, file_details, connection=None):
+        # load all files targeting the same table in a single vectorized scan;
+        # read_csv accepts a list of files as its source
+        rf2_filepaths = [
+            os.path.join(dirname, rf2_filename)
+            for dirname, rf2_filename in file_details
+        ]
+        file_list = "[" + ", ".join(f"'{path}'" for path in rf2_filepaths) + "]"
         try:
-            self.conn.execute(
-                f"COPY {table_name} FROM '{rf2_filepath}' ({COPY_OPTIONS});"
+            column_spec = self.table_column_spec(table_name, connection)
+            (connection or self.conn).execute(
+                f"INSERT INTO {table_name} SELECT * FROM "
+                f"read_csv({file_list}, {READ_CSV_OPTIONS}, columns = {column_spec});"
             )
-            logging.info(INFO_IMPORT_SUCCESS.format(rf2_filename))
+            # one summary line per table; per-file detail stays behind DEBUG
+            # so thousands of small files do not contend on the logging lock
+            for _, rf2_filename in file_details:
+                logging.debug(DEBUG_IMPORTED_FILE.format(rf2_filename))
+            logging.info(INFO_IMPORT_SUCCESS.format(len(file_details), table_name))
+            return True
+        except duckdb.CatalogException as e:
+            # the target table is absent, so the release type's DDL cannot
+            # have run cleanly; point at that rather than the CSV scan
+            logging.error(ERROR_IMPORT_TABLE_MISSING.format(table_name, e))
+            return False
         except Exception as e:
-            logging.error(ERROR_IMPORT_FAILURE.format(rf2_filename, e))
+            logging.error(ERROR_IMPORT_FAILURE.format(table_name, e))
             logging.debug(
-                DEBUG_FAILED_SQL.format(table_name, rf2_filepath, COPY_OPTIONS)
+                DEBUG_FAILED_SQL.format(table_name, file_list, READ_CSV_OPTIONS)
             )
+            return False
 
     def close(self):
         self.conn.close()
@@ -217,11 +416,19 @@ class DuckDBClient:
 def validate_targetcomponentid(client: DuckDBClient, release_type: ReleaseType):
     sql_filename = f"validate_{release_type.value.lower()}_targetcomponentid.sql"
 
-    result = client.execute_sql_file(SQL_RESOURCES_PATH, sql_filename)
+    invalid_count = client.execute_sql_file_scalar(sql_filename)
+
+    # the gate fails closed: if the count is unavailable the data cannot be
+    # trusted any more than if invalid rows had been found
+    if invalid_count is None:
+        logging.error(
+            f"Could not validate targetComponentIds in the Association Refset {release_type} file"
+        )
+        quit()
 
-    if len(result):
+    if invalid_count:
         logging.error(
-            f"Found {len(result)} invalid targetComponentIds in the Association Refset {release_type} file"
+            f"Found {invalid_count} invalid targetComponentIds in the Association Refset {release_type} file"
         )
         quit()
 
@@ -240,25 +447,53 @@ if __name__ == "__main__":
                 logging.error(ERROR_ZIP_NOT_FOUND)
                 quit()
             logging.info(INFO_EXTRACTING_PACKAGE.format(PACKAGE_LOCATION))
+            # extract only the RF2 release files, skipping documentation and
+            # metadata so the package is not written to disk twice
             with zipfile.ZipFile(PACKAGE_LOCATION, "r") as zip_ref:
-                zip_ref.extractall(temp_dir)
-            PACKAGE_LOCATION = os.path.join(temp_dir, os.listdir(temp_dir)[0])
+                for zip_info in zip_ref.infolist():
+                    if RF2_FILENAME_REGEX.match(os.path.basename(zip_info.filename)):
+                        zip_ref.extract(zip_info, temp_dir)
+            extracted_entries = os.listdir(temp_dir)
+            if not extracted_entries:
+                logging.error(ERROR_ZIP_NO_RF2_FILES)
+                quit()
+            PACKAGE_LOCATION = os.path.join(temp_dir, extracted_entries[0])
 
         duckdb_client = DuckDBClient(DB_FILE)
+        duckdb_client.configure_for_bulk_load()
         file_imported = False
         try:
+            # discover both release types up front and merge their work lists,
+            # so FULL and SNAPSHOT (disjoint _f/_s tables) share one thread
+            # pool and load concurrently instead of back to back
+            combined_details = {}
+            release_types_found = []
             for release_type in [ReleaseType.FULL, ReleaseType.SNAPSHOT]:
-                table_details = get_table_details(PACKAGE_LOCATION, release_type)
+                table_details = get_table_details(
+                    duckdb_client, PACKAGE_LOCATION, release_type
+                )
                 if not table_details:
                     logging.warning(WARNING_NO_MATCHING_FILES.format(release_type.name))
                 else:
                     duckdb_client.execute_ddl(release_type)
-                    for table_name, dirname, filename in table_details:
-                        duckdb_client.import_text_file(table_name, dirname, filename)
+                    combined_details.update(table_details)
+                    release_types_found.append(release_type)
+
+            if combined_details:
+                imported_count = duckdb_client.import_tables(combined_details)
+                if imported_count < len(combined_details):
+                    logging.error(
+                        ERROR_RELEASE_INCOMPLETE.format(
+                            "/".join(rt.name for rt in release_types_found)
+                        )
+                    )
+                if imported_count:
                     file_imported = True
-                    validate_targetcomponentid(duckdb_client, release_type)
+                    for release_type in release_types_found:
+                        validate_targetcomponentid(duckdb_client, release_type)
 
             if file_imported:
+                duckdb_client.checkpoint()
                 duckdb_client.start_ui()
                 logging.info(INFO_UI_RUNNING.format(UI_PORT))
                 input(PROMPT_CLOSE)